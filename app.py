@@ -1,18 +1,25 @@
 import os
+import json
 import uuid
+import shutil
 import sqlite3
+import threading
+from contextlib import closing
 from pathlib import Path
-from datetime import datetime
 import hashlib
 import hmac
 
+import numpy as np
 import pandas as pd
 import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 
 # -------------------------
 # Config
 # -------------------------
 DB_PATH = "crowdfunding_v2.db"   # DB file
+RECENT_INVESTMENTS_LIMIT = 10     # investments embedded per project
+DESC_PREVIEW_CHARS = 120          # description length shown on grid cards
 IMAGE_DIR = Path("project_images")
 IMAGE_DIR.mkdir(exist_ok=True)
 
@@ -20,181 +27,500 @@ IMAGE_DIR.mkdir(exist_ok=True)
 # -------------------------
 # Password hashing helpers
 # -------------------------
-def _hash_password(password: str) -> str:
-    """Return a SHA-256 hash of the password."""
+# hashlib.scrypt (and OpenSSL's SHA-NI-accelerated digests) only exist when
+# Python is built against OpenSSL; fail at startup rather than on first login
+if not hasattr(hashlib, "scrypt"):
+    raise RuntimeError("hashlib is not backed by OpenSSL; hashlib.scrypt is unavailable")
+
+SALT_BYTES = 16
+
+
+def _hash_password(password: str, salt: bytes) -> bytes:
+    """Return the raw 32-byte scrypt hash of the password with a per-user salt."""
+    return hashlib.scrypt(
+        password.encode("utf-8"), salt=salt, n=2**14, r=8, p=1, dklen=32
+    )
+
+
+def _hash_password_legacy(password: str) -> str:
+    """Unsalted SHA-256, only used to verify accounts created before scrypt."""
     return hashlib.sha256(password.encode("utf-8")).hexdigest()
 
 
+# Unknown emails still run one scrypt (against a fixed hash nothing matches)
+# so both login branches cost the same; nothing is hashed at import time
+_DUMMY_SALT = bytes(SALT_BYTES)
+_DUMMY_HASH = bytes(32)
+
+
 # -------------------------
 # Database helpers
 # -------------------------
-@st.cache_resource
-def get_connection():
-    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
+# created_at is filled in by SQLite (UTC, same naive ISO format as before)
+_SQL_USERS_TABLE = """
+    CREATE TABLE IF NOT EXISTS {table} (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        email TEXT UNIQUE NOT NULL,
+        display_name TEXT,
+        password_hash BLOB NOT NULL,
+        salt BLOB,
+        created_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now'))
+    )
+"""
+
+_SQL_PROJECTS_TABLE = """
+    CREATE TABLE IF NOT EXISTS {table} (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        description TEXT NOT NULL,
+        value_needed REAL NOT NULL,
+        interest_rate REAL NOT NULL,
+        image_path TEXT,
+        total_raised REAL NOT NULL DEFAULT 0,
+        created_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now')),
+        remaining REAL GENERATED ALWAYS AS (MAX(value_needed - total_raised, 0.0)) VIRTUAL
+    )
+"""
+
+_SQL_INVESTMENTS_TABLE = """
+    CREATE TABLE IF NOT EXISTS {table} (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        project_id INTEGER NOT NULL,
+        investor_name TEXT,
+        investor_username TEXT,
+        amount REAL NOT NULL,
+        created_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now')),
+        FOREIGN KEY (project_id) REFERENCES projects(id)
+    )
+"""
+
+_SQL_CREATE_USER = """
+    INSERT INTO users (email, display_name, password_hash, salt)
+    VALUES (?, ?, ?, ?)
+"""
+
+_SQL_SET_PASSWORD = """
+    UPDATE users SET password_hash = ?, salt = ? WHERE email = ?
+"""
+
+_SQL_CREATE_PROJECT = """
+    INSERT INTO projects (name, description, value_needed, interest_rate, image_path, total_raised)
+    VALUES (?, ?, ?, ?, ?, 0)
+"""
+
+# projects.total_raised is updated by the trg_inv_ai trigger
+_SQL_ADD_INV = """
+    INSERT INTO investments (project_id, investor_name, investor_username, amount)
+    VALUES (?, ?, ?, ?)
+"""
+
+
+def _apply_pragmas(conn):
+    """Tune a fresh connection for a read-heavy workload (WAL, mmap, big cache)."""
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA mmap_size=268435456")
+    conn.execute("PRAGMA cache_size=-65536")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA foreign_keys=ON")
+
+
+@st.cache_resource(max_entries=100)
+def _conn_for_session(session_id):
+    # One connection per session; WAL lets their readers and writers overlap.
+    # check_same_thread=False: a session's reruns may run on different threads.
+    # isolation_level=None: autocommit, so each statement is its own transaction
+    # and only multi-statement writes need an explicit BEGIN IMMEDIATE
+    conn = sqlite3.connect(DB_PATH, check_same_thread=False, isolation_level=None)
+    _apply_pragmas(conn)
     conn.row_factory = sqlite3.Row
     return conn
 
 
+def get_connection():
+    ctx = get_script_run_ctx()
+    return _conn_for_session(ctx.session_id if ctx is not None else "")
+
+
+def _ensure_created_at_default(cur, table, create_sql):
+    """
+    Rebuild `table` from `create_sql` if its created_at column has no DEFAULT.
+    SQLite can't alter a column default, so older DB files are copied over.
+    """
+    columns = cur.execute(f"PRAGMA table_info({table})").fetchall()
+    if not any(c["name"] == "created_at" and c["dflt_value"] is None for c in columns):
+        return
+
+    names = ", ".join(c["name"] for c in columns)
+    # DROP TABLE would otherwise trip the investments -> projects foreign key;
+    # the pragma is a no-op inside a transaction, so toggle it around one
+    cur.execute("PRAGMA foreign_keys=OFF")
+    try:
+        cur.execute("BEGIN IMMEDIATE")
+        try:
+            # trg_inv_ai names projects, so renaming projects_new would fail
+            # while it exists; init_db recreates it after all rebuilds
+            cur.execute("DROP TRIGGER IF EXISTS trg_inv_ai")
+            cur.execute(create_sql.format(table=f"{table}_new"))
+            cur.execute(f"INSERT INTO {table}_new ({names}) SELECT {names} FROM {table}")
+            cur.execute(f"DROP TABLE {table}")
+            cur.execute(f"ALTER TABLE {table}_new RENAME TO {table}")
+        except Exception:
+            cur.execute("ROLLBACK")
+            raise
+        cur.execute("COMMIT")
+    finally:
+        cur.execute("PRAGMA foreign_keys=ON")
+
+
 def init_db():
+    # Startup ANALYZE (no longer run) left stats from when the DB was small,
+    # which make the planner scan investments instead of using its indexes.
+    # Drop them before any connection loads them; a connection keeps its copy.
+    with closing(sqlite3.connect(DB_PATH, isolation_level=None)) as conn:
+        conn.execute("DROP TABLE IF EXISTS sqlite_stat1")
+
     conn = get_connection()
     cur = conn.cursor()
 
     # Users table for registration / login
-    cur.execute(
-        """
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            email TEXT UNIQUE NOT NULL,
-            display_name TEXT,
-            password_hash TEXT NOT NULL,
-            created_at TEXT NOT NULL
-        )
-        """
+    cur.execute(_SQL_USERS_TABLE.format(table="users"))
+    # Accounts from before scrypt have no salt; they're upgraded on next login
+    user_columns = [c["name"] for c in cur.execute("PRAGMA table_info(users)")]
+    if "salt" not in user_columns:
+        cur.execute("ALTER TABLE users ADD COLUMN salt BLOB")
+    _ensure_created_at_default(cur, "users", _SQL_USERS_TABLE)
+    # scrypt hashes were first stored as hex text; keep only raw bytes.
+    # Legacy SHA-256 rows (salt IS NULL) stay hex until their next login.
+    hex_rows = cur.execute(
+        "SELECT id, password_hash FROM users"
+        " WHERE salt IS NOT NULL AND typeof(password_hash) = 'text'"
+    ).fetchall()
+    cur.executemany(
+        "UPDATE users SET password_hash = ? WHERE id = ?",
+        [(bytes.fromhex(r["password_hash"]), r["id"]) for r in hex_rows],
     )
 
-    cur.execute(
-        """
-        CREATE TABLE IF NOT EXISTS projects (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            description TEXT NOT NULL,
-            value_needed REAL NOT NULL,
-            interest_rate REAL NOT NULL,
-            image_path TEXT,
-            total_raised REAL NOT NULL DEFAULT 0,
-            created_at TEXT NOT NULL
+    cur.execute(_SQL_PROJECTS_TABLE.format(table="projects"))
+    _ensure_created_at_default(cur, "projects", _SQL_PROJECTS_TABLE)
+    # Older DBs: add the generated column (same expression as _SQL_PROJECTS_TABLE;
+    # table_xinfo, unlike table_info, lists generated columns)
+    project_columns = [c["name"] for c in cur.execute("PRAGMA table_xinfo(projects)")]
+    if "remaining" not in project_columns:
+        cur.execute(
+            "ALTER TABLE projects ADD COLUMN remaining REAL"
+            " GENERATED ALWAYS AS (MAX(value_needed - total_raised, 0.0)) VIRTUAL"
         )
-        """
+
+    cur.execute(_SQL_INVESTMENTS_TABLE.format(table="investments"))
+    _ensure_created_at_default(cur, "investments", _SQL_INVESTMENTS_TABLE)
+
+    # Serves both branches of the per-user UNION ALL lookups
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS idx_inv_user ON investments(investor_username, investor_name)"
+    )
+    # Serves the per-project "latest N investments" lookup without a sort
+    cur.execute("DROP INDEX IF EXISTS idx_inv_project")
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS idx_inv_project_created"
+        " ON investments(project_id, created_at DESC)"
     )
 
+    # Keep projects.total_raised in sync inside the INSERT's own transaction
     cur.execute(
         """
-        CREATE TABLE IF NOT EXISTS investments (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            project_id INTEGER NOT NULL,
-            investor_name TEXT,
-            investor_username TEXT,
-            amount REAL NOT NULL,
-            created_at TEXT NOT NULL,
-            FOREIGN KEY (project_id) REFERENCES projects(id)
-        )
+        CREATE TRIGGER IF NOT EXISTS trg_inv_ai AFTER INSERT ON investments
+        BEGIN
+            UPDATE projects
+            SET total_raised = total_raised + NEW.amount
+            WHERE id = NEW.project_id;
+        END
         """
     )
 
-    conn.commit()
+
+@st.cache_resource
+def _init_db_once():
+    """Create the schema once per process instead of on every rerun."""
+    init_db()
 
 
 def get_user_by_email(email):
     conn = get_connection()
     cur = conn.cursor()
-    cur.execute("SELECT * FROM users WHERE email = ?", (email,))
+    cur.execute(
+        "SELECT email, display_name, password_hash, salt FROM users WHERE email = ?",
+        (email,),
+    )
     return cur.fetchone()
 
 
 def create_user(email, password_plain, display_name=None):
     conn = get_connection()
-    cur = conn.cursor()
-    password_hash = _hash_password(password_plain)
-    cur.execute(
-        """
-        INSERT INTO users (email, display_name, password_hash, created_at)
-        VALUES (?, ?, ?, ?)
-        """,
-        (email, display_name, password_hash, datetime.utcnow().isoformat()),
+    salt = os.urandom(SALT_BYTES)
+    password_hash = _hash_password(password_plain, salt)
+    conn.execute(
+        _SQL_CREATE_USER,
+        (email, display_name, password_hash, salt),
     )
-    conn.commit()
 
 
-def create_project(name, description, value_needed, interest_rate, image_path=None):
+def set_user_password(email, password_plain):
     conn = get_connection()
-    cur = conn.cursor()
-    cur.execute(
-        """
-        INSERT INTO projects (name, description, value_needed, interest_rate, image_path, total_raised, created_at)
-        VALUES (?, ?, ?, ?, ?, 0, ?)
-        """,
-        (name, description, value_needed, interest_rate, image_path, datetime.utcnow().isoformat()),
+    salt = os.urandom(SALT_BYTES)
+    conn.execute(_SQL_SET_PASSWORD, (_hash_password(password_plain, salt), salt, email))
+
+
+def verify_user_password(user, password_plain):
+    """
+    Check a password against a users row.
+    Legacy SHA-256 rows are re-hashed with scrypt on a successful match.
+    """
+    if user["salt"] is None:
+        # Spend one scrypt like the other branches, or a fast SHA-256
+        # rejection would tell legacy accounts apart from unknown emails
+        hmac.compare_digest(_DUMMY_HASH, _hash_password(password_plain, _DUMMY_SALT))
+        ok = hmac.compare_digest(user["password_hash"], _hash_password_legacy(password_plain))
+        if ok:
+            set_user_password(user["email"], password_plain)
+        return ok
+    return hmac.compare_digest(
+        user["password_hash"], _hash_password(password_plain, user["salt"])
     )
-    conn.commit()
 
 
-def list_projects():
+# Shared by every session: cached reads are keyed on plain args only, so
+# users hit the same entries and any user's write invalidates them for all.
+_cached_query = st.cache_data(ttl=300, max_entries=32, show_spinner=False)
+
+
+@st.cache_resource
+def _table_versions():
+    """Process-wide write counters per table (part of read cache keys)."""
+    return {"lock": threading.Lock(), "projects": 0, "investments": 0}
+
+
+def _table_version(table):
+    return _table_versions()[table]
+
+
+def _bump_table_versions(*tables):
+    """Invalidate only the cached reads that depend on the written tables."""
+    versions = _table_versions()
+    with versions["lock"]:
+        for table in tables:
+            versions[table] += 1
+    # Entries keyed on the old versions can't be hit again; free them now
+    for reader in {r for table in tables for r in _TABLE_READERS[table]}:
+        reader.clear()
+
+
+def create_project(name, description, value_needed, interest_rate, image_path=None):
     conn = get_connection()
-    cur = conn.cursor()
-    cur.execute(
-        """
-        SELECT * FROM projects
-        ORDER BY created_at DESC
-        """
+    conn.execute(
+        _SQL_CREATE_PROJECT,
+        (name, description, value_needed, interest_rate, image_path),
     )
-    return cur.fetchall()
+    _bump_table_versions("projects")
 
 
-def get_project(project_id):
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("SELECT * FROM projects WHERE id = ?", (project_id,))
-    return cur.fetchone()
+@st.cache_data(max_entries=64, show_spinner=False)
+def _load_image(path, mtime):
+    # mtime is only part of the cache key: a replaced file gets re-read
+    return Path(path).read_bytes()
 
 
-def add_investment(project_id, amount, investor_name=None, investor_username=None):
+def _project_image(p):
+    """Image bytes for a project row, or None if it has no readable image."""
+    if not p["image_exists"]:
+        return None
+    try:
+        return _load_image(p["image_path"], p["image_mtime"])
+    except OSError:
+        # The file was removed after the stats cache recorded it
+        return None
+
+
+@_cached_query
+def _list_projects_with_stats_cached(db_path, v_projects, v_investments):
     conn = get_connection()
     cur = conn.cursor()
-
     cur.execute(
         """
-        INSERT INTO investments (project_id, investor_name, investor_username, amount, created_at)
-        VALUES (?, ?, ?, ?, ?)
+        SELECT
+            p.id,
+            p.name,
+            p.description,
+            p.value_needed,
+            p.interest_rate,
+            p.image_path,
+            p.total_raised,
+            CASE
+                WHEN length(p.description) > :preview
+                THEN substr(p.description, 1, :preview) || '...'
+                ELSE p.description
+            END AS desc_short,
+            -- whole-number REALs come back from the generated column as ints
+            CAST(p.remaining AS REAL) AS remaining,
+            MIN(MAX(p.total_raised / NULLIF(p.value_needed, 0), 0.0), 1.0) AS progress,
+            (
+                SELECT json_group_array(
+                    json_object(
+                        'investor_name', r.investor_name,
+                        'amount', r.amount,
+                        'created_at', r.created_at
+                    )
+                )
+                FROM (
+                    SELECT investor_name, amount, created_at
+                    FROM investments
+                    WHERE project_id = p.id
+                    ORDER BY created_at DESC, id DESC
+                    LIMIT :recent
+                ) r
+            ) AS recent
+        FROM projects p
+        ORDER BY p.created_at DESC, p.id DESC
         """,
-        (project_id, investor_name, investor_username, amount, datetime.utcnow().isoformat()),
+        {"preview": DESC_PREVIEW_CHARS, "recent": RECENT_INVESTMENTS_LIMIT},
     )
+    projects = []
+    for row in cur.fetchall():
+        p = dict(row)
+        p["recent"] = json.loads(p["recent"])
+        # Checked once per cache fill, so this is as fresh as the stats TTL
+        p["image_exists"] = bool(p["image_path"]) and os.path.isfile(p["image_path"])
+        p["image_mtime"] = os.path.getmtime(p["image_path"]) if p["image_exists"] else None
+        # Grid card figures, formatted once per cache fill instead of per rerun
+        p["card_text"] = "\n\n".join(
+            [
+                f"Needed: €{p['value_needed']:.2f}",
+                f"Raised: €{p['total_raised']:.2f}",
+                f"Remaining: €{p['remaining']:.2f}",
+                f"Interest: {p['interest_rate']:.2f}%",
+            ]
+        )
+        projects.append(p)
+    return projects
 
-    cur.execute(
-        """
-        UPDATE projects
-        SET total_raised = total_raised + ?
-        WHERE id = ?
-        """,
-        (amount, project_id),
+
+def list_projects_with_stats():
+    """Projects with their progress and latest investments, in one query."""
+    return _list_projects_with_stats_cached(
+        DB_PATH, _table_version("projects"), _table_version("investments")
     )
 
-    conn.commit()
 
+def add_investment(project_id, amount, investor_name=None, investor_username=None):
+    conn = get_connection()
+    # One autocommit INSERT: the trigger's total_raised UPDATE runs in the
+    # same statement, so both land atomically without a BEGIN
+    conn.execute(
+        _SQL_ADD_INV,
+        (project_id, investor_name, investor_username, amount),
+    )
+    _bump_table_versions("projects", "investments")
 
-def list_investments_for_project(project_id):
+
+def bulk_add_investments(rows):
+    """
+    Insert many investments in one transaction (e.g. for seed scripts).
+    `rows` yields (project_id, investor_name, investor_username, amount) tuples.
+    """
     conn = get_connection()
-    cur = conn.cursor()
-    cur.execute(
-        """
-        SELECT * FROM investments
-        WHERE project_id = ?
-        ORDER BY created_at DESC
-        """,
-        (project_id,),
+    # Autocommit connection: without BEGIN each row would commit on its own
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.executemany(_SQL_ADD_INV, rows)
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+    _bump_table_versions("projects", "investments")
+
+
+_SQL_USER_INVESTMENTS = """
+    SELECT
+        julianday(i.created_at) AS created_at,
+        p.name AS project_name,
+        i.amount,
+        p.interest_rate AS project_interest_rate,
+        i.amount * p.interest_rate / 100.0 AS expected_gain
+    FROM (
+        SELECT project_id, amount, created_at
+        FROM investments WHERE investor_username = ?
+        UNION ALL
+        SELECT project_id, amount, created_at
+        FROM investments WHERE investor_username IS NULL AND investor_name = ?
+    ) i
+    JOIN projects p ON i.project_id = p.id
+    ORDER BY i.created_at
+"""
+
+
+@_cached_query
+def _list_investments_for_user_cached(db_path, v_investments, investor_name, investor_username):
+    # Julian day numbers -> datetimes as one vectorized cast, done once per cache fill
+    df = pd.read_sql_query(
+        _SQL_USER_INVESTMENTS,
+        get_connection(),
+        params=(investor_username, investor_name),
+        parse_dates={"created_at": {"unit": "D", "origin": "julian"}},
     )
-    return cur.fetchall()
+    # julianday() float noise; stored timestamps only have millisecond precision
+    df["created_at"] = df["created_at"].dt.round("ms")
+    return df
 
 
 def list_investments_for_user(investor_name, investor_username):
+    return _list_investments_for_user_cached(
+        DB_PATH, _table_version("investments"), investor_name, investor_username
+    )
+
+
+@_cached_query
+def _get_user_summary_cached(db_path, v_investments, investor_name, investor_username):
     conn = get_connection()
     cur = conn.cursor()
     cur.execute(
         """
         SELECT
-            i.*,
             p.name AS project_name,
-            p.interest_rate AS project_interest_rate,
-            p.value_needed AS project_value_needed,
-            p.total_raised AS project_total_raised
-        FROM investments i
+            SUM(i.amount) AS total_invested,
+            AVG(p.interest_rate) AS avg_interest,
+            SUM(i.amount * p.interest_rate / 100.0) AS expected_gain,
+            COUNT(*) AS num_investments
+        FROM (
+            SELECT project_id, amount FROM investments WHERE investor_username = ?
+            UNION ALL
+            SELECT project_id, amount FROM investments
+            WHERE investor_username IS NULL AND investor_name = ?
+        ) i
         JOIN projects p ON i.project_id = p.id
-        WHERE i.investor_username = ?
-           OR (i.investor_username IS NULL AND i.investor_name = ?)
-        ORDER BY i.created_at
+        GROUP BY p.id
+        ORDER BY p.name
         """,
         (investor_username, investor_name),
     )
-    return cur.fetchall()
+    return [dict(r) for r in cur.fetchall()]
+
+
+def get_user_summary(investor_name, investor_username):
+    """Per-project totals for a user, aggregated in SQLite."""
+    return _get_user_summary_cached(
+        DB_PATH, _table_version("investments"), investor_name, investor_username
+    )
+
+
+# Cached readers per table they depend on, cleared by _bump_table_versions
+_TABLE_READERS = {
+    "projects": [_list_projects_with_stats_cached],
+    "investments": [
+        _list_projects_with_stats_cached,
+        _list_investments_for_user_cached,
+        _get_user_summary_cached,
+    ],
+}
 
 
 # -------------------------
@@ -205,17 +531,10 @@ def login_or_register():
     Show a page with Login and Register tabs.
     Returns (display_name, authenticated_bool, email_username_str)
     """
-    if "auth" not in st.session_state:
-        st.session_state.auth = {
-            "logged_in": False,
-            "username": None,
-            "name": None,
-        }
-
-    auth = st.session_state.auth
-
-    if auth["logged_in"]:
-        return auth["name"], True, auth["username"]
+    if st.session_state.setdefault("_authed", False):
+        return st.session_state._name, True, st.session_state._username
+    st.session_state.setdefault("_username", None)
+    st.session_state.setdefault("_name", None)
 
     st.title("Mini Crowdfunding Platform")
 
@@ -233,17 +552,14 @@ def login_or_register():
             email_login = email_login.strip().lower()
             user = get_user_by_email(email_login)
             if user is None:
+                hmac.compare_digest(_DUMMY_HASH, _hash_password(password_login, _DUMMY_SALT))
                 st.error("Incorrect email or password.")
             else:
-                expected_hash = user["password_hash"]
-                pwd_hash = _hash_password(password_login)
-                if hmac.compare_digest(expected_hash, pwd_hash):
+                if verify_user_password(user, password_login):
                     display_name = user["display_name"] or user["email"]
-                    st.session_state.auth = {
-                        "logged_in": True,
-                        "username": user["email"],
-                        "name": display_name,
-                    }
+                    st.session_state._authed = True
+                    st.session_state._username = user["email"]
+                    st.session_state._name = display_name
                     st.success("Login successful. Loading your app...")
                     st.rerun()
                 else:
@@ -278,12 +594,9 @@ def login_or_register():
 
 
 def logout():
-    if "auth" in st.session_state:
-        st.session_state.auth = {
-            "logged_in": False,
-            "username": None,
-            "name": None,
-        }
+    st.session_state._authed = False
+    st.session_state._username = None
+    st.session_state._name = None
     st.rerun()
 
 
@@ -326,8 +639,9 @@ def page_submit_project():
             extension = os.path.splitext(uploaded_image.name)[1]
             filename = f"{uuid.uuid4().hex}{extension}"
             filepath = IMAGE_DIR / filename
+            uploaded_image.seek(0)
             with open(filepath, "wb") as f:
-                f.write(uploaded_image.getvalue())
+                shutil.copyfileobj(uploaded_image, f, length=1024 * 1024)
             image_path = str(filepath)
 
         create_project(name, description, value_needed, interest_rate, image_path)
@@ -337,10 +651,12 @@ def page_submit_project():
 # -------------------------
 # UI: Invest in projects
 # -------------------------
+@st.fragment
 def page_invest(current_name, current_username):
+    # Fragment: selecting a project reruns this tab only, not the other three
     st.subheader("💰 Invest in projects")
 
-    projects = list_projects()
+    projects = list_projects_with_stats()
     if not projects:
         st.info("There are no projects yet. Check back later or submit one yourself!")
         return
@@ -355,93 +671,92 @@ def page_invest(current_name, current_username):
         cols = st.columns(3)
         for col, p in zip(cols, projects[i: i + 3]):
             with col:
-                remaining = max(p["value_needed"] - p["total_raised"], 0)
                 with st.container(border=True):
                     st.markdown(f"**{p['name']}**")
-                    if p["image_path"] and Path(p["image_path"]).exists():
-                        st.image(p["image_path"], use_column_width=True)
-                    st.caption(
-                        p["description"][:120]
-                        + ("..." if len(p["description"]) > 120 else "")
-                    )
-                    st.write(f"Needed: €{p['value_needed']:.2f}")
-                    st.write(f"Raised: €{p['total_raised']:.2f}")
-                    st.write(f"Remaining: €{remaining:.2f}")
-                    st.write(f"Interest: {p['interest_rate']:.2f}%")
+                    image = _project_image(p)
+                    if image is not None:
+                        st.image(image, use_column_width=True)
+                    st.caption(p["desc_short"])
+                    st.markdown(p["card_text"])
 
-                    if p["value_needed"] > 0:
-                        progress = p["total_raised"] / p["value_needed"]
-                        progress = min(max(progress, 0), 1)
-                        st.progress(progress)
+                    if p["progress"] is not None:
+                        st.progress(p["progress"])
 
                     if st.button("Select this project", key=f"select_{p['id']}"):
                         st.session_state["selected_project_id"] = p["id"]
 
     st.markdown("---")
 
-    selected_id = st.session_state.get("selected_project_id")
-    project = get_project(selected_id) if selected_id else None
-
+    # Reuse the list already loaded for the grid instead of a second lookup
+    projects_by_id = {p["id"]: p for p in projects}
+    project = projects_by_id.get(st.session_state.get("selected_project_id"))
     if project:
-        remaining = max(project["value_needed"] - project["total_raised"], 0)
-
-        st.markdown(f"### Selected project: **{project['name']}**")
-        cols = st.columns([2, 1])
-
-        with cols[0]:
-            st.markdown(f"**Description**: {project['description']}")
-            st.markdown(f"**Value needed**: €{project['value_needed']:.2f}")
-            st.markdown(f"**Interest rate**: {project['interest_rate']:.2f}%")
-            st.markdown(f"**Raised so far**: €{project['total_raised']:.2f}")
-            st.markdown(f"**Remaining**: €{remaining:.2f}")
-
-            if project["value_needed"] > 0:
-                progress = project["total_raised"] / project["value_needed"]
-                progress = min(max(progress, 0), 1)
-                st.progress(progress)
-
-        with cols[1]:
-            if project["image_path"] and Path(project["image_path"]).exists():
-                st.image(project["image_path"], use_column_width=True)
-            else:
-                st.caption("No image available.")
+        _project_detail(project, current_name, current_username)
 
-        st.markdown("#### Make an investment")
 
-        invest_amount = st.number_input(
-            "Amount to invest (€)",
-            min_value=0.0,
-            max_value=remaining if remaining > 0 else 0.0,
-            step=10.0,
-            format="%.2f",
-            key=f"invest_amount_{project['id']}",
-        )
+@st.fragment
+def _project_detail(project, current_name, current_username):
+    # Nested fragment: editing the amount doesn't re-render the grid.
+    # On its own reruns `project` is the dict from the last page_invest run;
+    # investing triggers a full app rerun, so it is never stale after a write.
+    remaining = project["remaining"]
 
-        if st.button("Invest now", key=f"invest_button_{project['id']}"):
-            if invest_amount <= 0:
-                st.error("Please enter a positive amount.")
-            elif invest_amount > remaining:
-                st.error("Amount exceeds the remaining amount needed for this project.")
-            else:
-                add_investment(
-                    project["id"],
-                    invest_amount,
-                    investor_name=current_name,
-                    investor_username=current_username,
-                )
-                st.success("Thank you for your investment! 🎉")
-                st.rerun()
-
-        st.markdown("#### Recent investments for this project")
-        investments = list_investments_for_project(project["id"])
-        if investments:
-            for inv in investments:
-                name = inv["investor_name"] or "Anonymous investor"
-                st.write(
-                    f"- {name} invested €{inv['amount']:.2f} on {inv['created_at']}"
-                )
+    st.markdown(f"### Selected project: **{project['name']}**")
+    cols = st.columns([2, 1])
+
+    with cols[0]:
+        st.markdown(f"**Description**: {project['description']}")
+        st.markdown(f"**Value needed**: €{project['value_needed']:.2f}")
+        st.markdown(f"**Interest rate**: {project['interest_rate']:.2f}%")
+        st.markdown(f"**Raised so far**: €{project['total_raised']:.2f}")
+        st.markdown(f"**Remaining**: €{remaining:.2f}")
+
+        if project["progress"] is not None:
+            st.progress(project["progress"])
+
+    with cols[1]:
+        image = _project_image(project)
+        if image is not None:
+            st.image(image, use_column_width=True)
         else:
-            st.caption("No investments yet for this project.")
+            st.caption("No image available.")
+
+    st.markdown("#### Make an investment")
+
+    invest_amount = st.number_input(
+        "Amount to invest (€)",
+        min_value=0.0,
+        max_value=remaining if remaining > 0 else 0.0,
+        step=10.0,
+        format="%.2f",
+        key=f"invest_amount_{project['id']}",
+    )
+
+    if st.button("Invest now", key=f"invest_button_{project['id']}"):
+        if invest_amount <= 0:
+            st.error("Please enter a positive amount.")
+        elif invest_amount > remaining:
+            st.error("Amount exceeds the remaining amount needed for this project.")
+        else:
+            add_investment(
+                project["id"],
+                invest_amount,
+                investor_name=current_name,
+                investor_username=current_username,
+            )
+            st.success("Thank you for your investment! 🎉")
+            st.rerun()
+
+    st.markdown("#### Recent investments for this project")
+    investments = project["recent"]
+    if investments:
+        for inv in investments:
+            name = inv["investor_name"] or "Anonymous investor"
+            st.write(
+                f"- {name} invested €{inv['amount']:.2f} on {inv['created_at']}"
+            )
+    else:
+        st.caption("No investments yet for this project.")
 
 
 # -------------------------
@@ -450,13 +765,13 @@ def page_invest(current_name, current_username):
 def page_overview():
     st.subheader("📊 Project overview")
 
-    projects = list_projects()
+    projects = list_projects_with_stats()
     if not projects:
         st.info("No projects yet.")
         return
 
     for p in projects:
-        remaining = max(p["value_needed"] - p["total_raised"], 0)
+        remaining = p["remaining"]
         with st.expander(f"{p['name']} – remaining: €{remaining:.2f}"):
             cols = st.columns([2, 1])
 
@@ -467,14 +782,13 @@ def page_overview():
                 st.markdown(f"**Raised**: €{p['total_raised']:.2f}")
                 st.markdown(f"**Remaining**: €{remaining:.2f}")
 
-                if p["value_needed"] > 0:
-                    progress = p["total_raised"] / p["value_needed"]
-                    progress = min(max(progress, 0), 1)
-                    st.progress(progress)
+                if p["progress"] is not None:
+                    st.progress(p["progress"])
 
             with cols[1]:
-                if p["image_path"] and Path(p["image_path"]).exists():
-                    st.image(p["image_path"], use_column_width=True)
+                image = _project_image(p)
+                if image is not None:
+                    st.image(image, use_column_width=True)
                 else:
                     st.caption("No image available.")
 
@@ -485,51 +799,18 @@ def page_overview():
 def page_personal_page(current_name, current_username):
     st.subheader("👤 My Page")
 
-    investments = list_investments_for_user(current_name, current_username)
+    df = list_investments_for_user(current_name, current_username)
 
-    if not investments:
+    if df.empty:
         st.info("You haven't invested in any projects yet.")
         return
 
-    df = pd.DataFrame(investments)
-
-    # If columns are numeric (0,1,2,...) map them to meaningful names
-    if "amount" not in df.columns:
-        # Try to map 0..9 to expected names (matches your screenshot)
-        if len(df.columns) >= 10:
-            df = df.rename(
-                columns={
-                    0: "id",
-                    1: "project_id",
-                    2: "investor_name",
-                    3: "investor_username",
-                    4: "amount",
-                    5: "created_at",
-                    6: "project_name",
-                    7: "project_interest_rate",
-                    8: "project_value_needed",
-                    9: "project_total_raised",
-                }
-            )
-        else:
-            st.error("Internal error: investment data has unexpected format.")
-            st.write("Raw data:", df)
-            return
-
-    # If project_interest_rate is missing, assume 0%
-    if "project_interest_rate" not in df.columns:
-        df["project_interest_rate"] = 0.0
-
-    # created_at handling
-    if "created_at" in df.columns:
-        df["created_at"] = pd.to_datetime(df["created_at"])
-    else:
-        df["created_at"] = pd.to_datetime(df.index, unit="D", origin="unix")
-
-    df["expected_gain"] = df["amount"] * df["project_interest_rate"] / 100.0
-    df = df.sort_values("created_at")
-    df["cum_invested"] = df["amount"].cumsum()
-    df["cum_expected_gain"] = df["expected_gain"].cumsum()
+    # Rows arrive ORDER BY created_at and expected_gain comes from SQL,
+    # so both running totals are one in-place cumsum over a fresh array
+    cumulative = df[["amount", "expected_gain"]].to_numpy(dtype=float, copy=True)
+    np.cumsum(cumulative, axis=0, out=cumulative)
+    df["cum_invested"] = cumulative[:, 0]
+    df["cum_expected_gain"] = cumulative[:, 1]
 
     st.markdown("### Investment history")
     st.line_chart(
@@ -538,16 +819,7 @@ def page_personal_page(current_name, current_username):
     )
 
     st.markdown("### Investment summary by project")
-    summary = (
-        df.groupby("project_name")
-        .agg(
-            total_invested=("amount", "sum"),
-            avg_interest=("project_interest_rate", "mean"),
-            expected_gain=("expected_gain", "sum"),
-            num_investments=("id", "count"),
-        )
-        .reset_index()
-    )
+    summary = pd.DataFrame(get_user_summary(current_name, current_username))
 
     st.dataframe(
         summary.style.format(
@@ -594,7 +866,7 @@ def main():
         page_icon="💶",
         layout="wide",
     )
-    init_db()
+    _init_db_once()
 
     # ---- Login / Register ----
     name, authenticated, username = login_or_register()